@@ -0,0 +1,305 @@
+import time
+import threading
+from collections import defaultdict
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+from Queue import Queue, Empty
+
+from evaluator import (OpportunityEvaluator, StalenessGuard,
+                       refresh_opportunities)
+from util import initialize_logger
+
+
+def shard(markets, index, count):
+    # Round-robin a list of (origin, currency) markets into `count` disjoint
+    # shards and return the one at `index` grouped by origin.
+    assignment = defaultdict(list)
+    for origin, currency in markets[index::count]:
+        assignment[origin].append(currency)
+    return dict(assignment)
+
+
+def parse_address(address):
+    host, port = address.rsplit(':', 1)
+    return (host, int(port))
+
+
+class LocalTransport(object):
+    # In-process transport: workers and the coordinator share a queue.
+    # Messages are received together with the time they arrived.
+    def __init__(self):
+        self.queue = Queue()
+
+    def publish(self, message):
+        self.queue.put((message, time.time()))
+
+    def receive(self, timeout=None):
+        try:
+            return self.queue.get(timeout=timeout)
+        except Empty:
+            return None
+
+
+class SocketPublisher(object):
+    # Worker side of the socket transport. A connection that fails is dropped
+    # and re-established, so workers survive a coordinator restart.
+    def __init__(self, address, authkey):
+        self.address = address
+        self.authkey = authkey
+        self.conn = None
+        self.connect()
+
+    def connect(self):
+        self.conn = Client(self.address, authkey=self.authkey)
+
+    def close(self):
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except (IOError, OSError):
+                pass
+            self.conn = None
+
+    def publish(self, message):
+        try:
+            if self.conn is None:
+                self.connect()
+            self.conn.send(message)
+        except (IOError, OSError, EOFError):
+            self.close()
+            self.connect()
+            self.conn.send(message)
+
+
+class SocketCollector(object):
+    # Coordinator side of the socket transport. Every worker connection gets
+    # a reader thread that forwards its messages onto a single local queue,
+    # stamped with the coordinator's clock when they arrive.
+    def __init__(self, address, authkey, logger=None):
+        self.listener = Listener(address, authkey=authkey)
+        self.queue = Queue()
+        self.logger = logger or initialize_logger('COLLECTOR')
+        self.spawn(self.accept)
+
+    def spawn(self, target, *args):
+        thread = threading.Thread(target=target, args=args)
+        thread.daemon = True
+        thread.start()
+
+    def accept(self):
+        while True:
+            # A client with the wrong key or one that hangs up mid-handshake
+            # must not stop other workers from connecting.
+            try:
+                conn = self.listener.accept()
+            except (AuthenticationError, EOFError, IOError, OSError) as ex:
+                templ = "Rejected a connection with {}. Arguments: {!r}"
+                self.logger.warning(templ.format(type(ex), ex.args))
+                continue
+            self.spawn(self.read, conn)
+
+    def read(self, conn):
+        try:
+            while True:
+                message = conn.recv()
+                self.queue.put((message, time.time()))
+        except (EOFError, IOError, OSError):
+            conn.close()
+
+    def receive(self, timeout=None):
+        try:
+            return self.queue.get(timeout=timeout)
+        except Empty:
+            return None
+
+
+class Worker(object):
+    # Scans a shard of markets and publishes the best fresh opportunity of
+    # each origin. Workers never place orders. Quote ages are measured here,
+    # where the quotes were received and the exchange latencies observed, and
+    # are sent along so the coordinator never compares clocks across hosts.
+    def __init__(self,
+                 assignment,
+                 apis,
+                 score,
+                 transport,
+                 min_spread_pct=0.01,
+                 guard=None,
+                 logger=None):
+        self.assignment = assignment
+        self.apis = apis
+        self.transport = transport
+        self.min_spread_pct = min_spread_pct
+        self.logger = logger or initialize_logger('WORKER')
+        self.guard = guard or StalenessGuard(apis=apis, logger=self.logger)
+        self.evaluators = {
+            origin: OpportunityEvaluator(origin=origin, score=score)
+            for origin in assignment
+        }
+
+    def scan(self):
+        published = []
+        for origin, currencies in self.assignment.items():
+            evaluator = self.evaluators[origin]
+            refresh_opportunities(
+                evaluator=evaluator,
+                currencies=currencies,
+                orig_api=self.apis[origin],
+                dest_apis=[
+                    api for name, api in self.apis.items() if name != origin
+                ])
+            # Fall back to the next candidate when the best one is stale.
+            for opp in evaluator.best_first():
+                if not (opp.pnl > 0 and opp.spread_pct >= self.min_spread_pct):
+                    break
+                age, skew, window = self.guard.measure(origin, opp)
+                if self.guard.admit(origin, opp, age, skew, window):
+                    self.transport.publish((origin, opp, age, skew, window))
+                    published.append(opp)
+                    break
+        return published
+
+    def run(self, interval=30):
+        while True:
+            # A failing exchange or coordinator only costs this cycle; the
+            # shard keeps being scanned on the next one.
+            try:
+                self.scan()
+            except Exception as ex:
+                templ = "An exception with {} occurred. Arguments: {!r}"
+                self.logger.error(templ.format(type(ex), ex.args))
+            time.sleep(interval)
+
+
+class Coordinator(object):
+    # Owns balance reservations and order execution for every worker. An
+    # opportunity is only executed for the inventory that is still free after
+    # subtracting the reservations of trades that are in flight, and only while
+    # its quotes are still fresh. The worker's measured ages and window are
+    # trusted; the coordinator adds the time the message has spent here since
+    # it arrived and checks again right before placing the orders.
+    def __init__(self,
+                 apis,
+                 transport,
+                 minimum_order_size=None,
+                 min_spread_pct=0.01,
+                 max_age=30,
+                 settle_delay=10,
+                 guard=None,
+                 logger=None):
+        self.apis = apis
+        self.transport = transport
+        self.minimum_order_size = minimum_order_size or {}
+        self.min_spread_pct = min_spread_pct
+        self.max_age = max_age
+        self.settle_delay = settle_delay
+        self.logger = logger or initialize_logger('COORDINATOR')
+        self.guard = guard or StalenessGuard(apis=apis, logger=self.logger)
+        self.reserved = defaultdict(float)
+        self.releases = 0
+        self.lock = threading.Lock()
+
+    def run(self):
+        while True:
+            # An exchange error while reserving only costs this message; the
+            # coordinator and its local workers keep running.
+            try:
+                self.poll(timeout=1)
+            except Exception as ex:
+                templ = "An exception with {} occurred. Arguments: {!r}"
+                self.logger.error(templ.format(type(ex), ex.args))
+
+    def poll(self, timeout=None):
+        received = self.transport.receive(timeout=timeout)
+        if received is None:
+            return None
+        (origin, opp, age, skew, window), arrived = received
+        return self.handle(origin, opp, age, skew, window, arrived)
+
+    def handle(self, origin, opp, age, skew, window, arrived):
+        if time.time() - arrived > self.max_age:
+            self.logger.debug('Dropping stale opportunity: {}'.format(opp))
+            return None
+        if not (opp.pnl > 0 and opp.spread_pct >= self.min_spread_pct):
+            return None
+
+        size = self.reserve(origin, opp)
+        if not size:
+            self.logger.debug(
+                'Not enough free inventory for {} from {} to {}.'.format(
+                    opp.currency, origin, opp.destination))
+            return None
+
+        thread = threading.Thread(
+            target=self.execute,
+            args=(origin, opp, size, age, skew, window, arrived))
+        thread.start()
+        return thread
+
+    def reserve(self, origin, opp):
+        orig_key = (origin, 'BTC')
+        dest_key = (opp.destination, opp.currency)
+        while True:
+            # Balances are fetched outside the lock so that other reservations
+            # and releases do not wait on the exchange round trips. A trade
+            # that settles during the fetch may be missing from the snapshot
+            # while its reservation is already gone, so fetch again.
+            with self.lock:
+                releases = self.releases
+            orig_bal = self.apis[origin].balances(currencies=['BTC'])['BTC']
+            dest_bal = self.apis[opp.destination].balances(
+                currencies=[opp.currency])[opp.currency]
+
+            with self.lock:
+                if self.releases != releases:
+                    continue
+                orig_bal -= self.reserved[orig_key]
+                dest_bal -= self.reserved[dest_key]
+
+                size = int(min(orig_bal / opp.orig_rate, dest_bal, opp.size))
+                if size <= 0 or size < self.minimum_order_size.get(
+                        opp.currency, 0):
+                    return 0
+
+                self.reserved[orig_key] += size * opp.orig_rate
+                self.reserved[dest_key] += size
+                return size
+
+    def release(self, origin, opp, size):
+        with self.lock:
+            self.reserved[(origin, 'BTC')] -= size * opp.orig_rate
+            self.reserved[(opp.destination, opp.currency)] -= size
+            self.releases += 1
+
+    def execute(self, origin, opp, size, age, skew, window, arrived):
+        try:
+            age += time.time() - arrived
+            if not self.guard.admit(origin, opp, age, skew, window):
+                return
+            self.logger.info(
+                ('Initiating the trade for the best opportunity. '
+                 'currency:{}, origin:{}, destination:{}, spread_pct:{:.4f} '
+                 'estimated_pnl:{:.8f}, size:{:2f}').format(
+                     opp.currency, origin, opp.destination, opp.spread_pct,
+                     opp.pnl, size))
+            self.apis[origin].buy(
+                currency=opp.currency, size=size, rate=opp.orig_rate)
+            self.apis[opp.destination].sell(
+                currency=opp.currency, size=size, rate=opp.dest_rate)
+
+            time.sleep(self.settle_delay)
+            balance = self.apis[origin].balances(
+                currencies=[opp.currency])[opp.currency]
+            self.apis[origin].withdraw(
+                currency=opp.currency,
+                size=min(size, balance),
+                destination=opp.destination)
+        except Exception as ex:
+            templ = ("Trade failed. currency:{}, origin:{}, destination:{}, "
+                     "size:{:2f}. An exception with {} occurred. "
+                     "Arguments: {!r}")
+            self.logger.error(
+                templ.format(opp.currency, origin, opp.destination, size,
+                             type(ex), ex.args))
+        finally:
+            self.release(origin, opp, size)
@@ -0,0 +1,200 @@
+import time
+import heapq
+from itertools import count
+
+
+# Keeps the score of every (destination, currency) candidate for a single
+# origin and rescores only the candidates affected by an update. The best
+# opportunity lives in a max-heap with lazy deletion: each rescore pushes a new
+# entry and bumps the candidate's version, and stale entries are discarded when
+# they surface at the top of the heap.
+class OpportunityEvaluator(object):
+    def __init__(self, origin, score):
+        self.origin = origin
+        self.score = score
+        self.orig_bal = None
+        self.orig_rates = {}
+        self.orig_received = {}
+        self.dest_rates = {}
+        self.dest_received = {}
+        self.dest_bals = {}
+        self.opps = {}
+        self.versions = {}
+        self.heap = []
+        self.seq = count()
+
+    def update_orig_balance(self, balance):
+        # The origin BTC balance sizes every candidate.
+        if balance == self.orig_bal:
+            return
+        self.orig_bal = balance
+        for destination, currency in self.candidates():
+            self.rescore(destination, currency)
+
+    def update_orig_rate(self, currency, rate, received=None):
+        restamp = self.orig_received.get(currency) != received
+        self.orig_received[currency] = received
+        if self.orig_rates.get(currency) == rate:
+            if restamp:
+                for destination in self.dest_rates:
+                    self.restamp(destination, currency)
+            return
+        self.orig_rates[currency] = rate
+        for destination in self.dest_rates:
+            self.rescore(destination, currency)
+
+    def update_dest_rate(self, destination, currency, rate, received=None):
+        stamps = self.dest_received.setdefault(destination, {})
+        restamp = stamps.get(currency) != received
+        stamps[currency] = received
+        rates = self.dest_rates.setdefault(destination, {})
+        if rates.get(currency) == rate:
+            if restamp:
+                self.restamp(destination, currency)
+            return
+        rates[currency] = rate
+        self.rescore(destination, currency)
+
+    def update_dest_balance(self, destination, currency, balance):
+        bals = self.dest_bals.setdefault(destination, {})
+        if bals.get(currency) == balance:
+            return
+        bals[currency] = balance
+        self.rescore(destination, currency)
+
+    def candidates(self):
+        return [(destination, currency)
+                for destination, rates in self.dest_rates.items()
+                for currency in rates]
+
+    def rescore(self, destination, currency):
+        key = (destination, currency)
+        try:
+            kwargs = {
+                'origin': self.origin,
+                'destination': destination,
+                'currency': currency,
+                'orig_rate': self.orig_rates[currency],
+                'dest_rate': self.dest_rates[destination][currency],
+                'orig_bal': self.orig_bal,
+                'dest_bal': self.dest_bals[destination][currency],
+                'orig_received': self.orig_received.get(currency),
+                'dest_received': self.dest_received[destination].get(currency),
+            }
+        except KeyError:
+            # Not every leg of the candidate has been observed yet.
+            return
+        if kwargs['orig_bal'] is None:
+            return
+
+        opp = self.score(kwargs)
+        version = next(self.seq)
+        self.opps[key] = opp
+        self.versions[key] = version
+        heapq.heappush(self.heap, (-opp.pnl, version, key))
+
+        if len(self.heap) > 2 * len(self.opps) + 16:
+            self.compact()
+
+    def restamp(self, destination, currency):
+        # A quote was observed again at the same rate: the score still holds,
+        # only the observation times of its legs move forward.
+        key = (destination, currency)
+        if key in self.opps:
+            self.opps[key] = self.opps[key]._replace(
+                orig_received=self.orig_received.get(currency),
+                dest_received=self.dest_received[destination].get(currency))
+
+    def compact(self):
+        self.heap = [(-self.opps[key].pnl, version, key)
+                     for key, version in self.versions.items()]
+        heapq.heapify(self.heap)
+
+    def best(self):
+        while self.heap:
+            _, version, key = self.heap[0]
+            if self.versions.get(key) == version:
+                return self.opps[key]
+            heapq.heappop(self.heap)
+        return None
+
+    def best_first(self):
+        # Yields the current opportunities from best to worst. The heap is
+        # walked through a frontier of its nodes instead of being sorted, so
+        # taking the first k costs O(k log k).
+        frontier = [(self.heap[0], 0)] if self.heap else []
+        while frontier:
+            (_, version, key), i = heapq.heappop(frontier)
+            if self.versions.get(key) == version:
+                yield self.opps[key]
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(self.heap):
+                    heapq.heappush(frontier, (self.heap[child], child))
+
+
+def refresh_opportunities(evaluator, currencies, orig_api, dest_apis):
+    # Feed the latest quotes and balances into the evaluator. Values that have
+    # not moved since the previous cycle do not trigger a rescore. Balances
+    # are fetched first so that the origin and destination quotes are
+    # requested back to back and their receive times stay close.
+    evaluator.update_orig_balance(
+        orig_api.balances(currencies=['BTC'])['BTC'])
+    for ex in dest_apis:
+        for currency, bal in ex.balances(currencies=currencies).items():
+            evaluator.update_dest_balance(ex.name, currency, bal)
+
+    for currency, quote in orig_api.tickers(currencies=currencies).items():
+        evaluator.update_orig_rate(currency, quote['ask'], quote['received'])
+    for ex in dest_apis:
+        for currency, quote in ex.tickers(currencies=currencies).items():
+            evaluator.update_dest_rate(ex.name, currency, quote['bid'],
+                                       quote['received'])
+
+
+# Rejects opportunities whose legs were observed too long ago or too far apart
+# to be trusted. The window is learned from the latency each exchange has
+# shown on its quote requests: the two legs may lie up to one window apart,
+# and the older leg may be up to two windows old when the trade is placed.
+class StalenessGuard(object):
+    def __init__(self, apis, logger, floor=1.0):
+        self.apis = apis
+        self.logger = logger
+        self.floor = floor
+        self.checked = 0
+        self.avoided = 0
+
+    def window(self, origin, destination):
+        thresholds = [
+            self.apis[ex].staleness_threshold()
+            for ex in (origin, destination)
+        ]
+        return max(self.floor, sum(t for t in thresholds if t is not None))
+
+    def measure(self, origin, opp, now=None):
+        # Age of the older leg, distance between the legs and the window to
+        # hold them to, all taken from this host's clock and latencies.
+        window = self.window(origin, opp.destination)
+        if opp.orig_received is None or opp.dest_received is None:
+            return float('inf'), float('inf'), window
+        now = time.time() if now is None else now
+        skew = abs(opp.orig_received - opp.dest_received)
+        age = now - min(opp.orig_received, opp.dest_received)
+        return age, skew, window
+
+    def fresh(self, origin, opp, now=None):
+        age, skew, window = self.measure(origin, opp, now=now)
+        return self.admit(origin, opp, age, skew, window)
+
+    def admit(self, origin, opp, age, skew, window):
+        self.checked += 1
+        if skew <= window and age <= 2 * window:
+            return True
+
+        self.avoided += 1
+        self.logger.info(
+            ('Avoided a trade on stale quotes. currency:{}, origin:{}, '
+             'destination:{}, age:{:.3f}, skew:{:.3f}, window:{:.3f}, '
+             'avoided:{}/{}').format(opp.currency, origin, opp.destination,
+                                     age, skew, window, self.avoided,
+                                     self.checked))
+        return False
@@ -1,5 +1,6 @@
 from abc import ABCMeta, abstractmethod
 import json
+import time
 
 from bittrex.bittrex import Bittrex as _Bittrex
 from krakenex import API as _Kraken
@@ -13,6 +14,11 @@ with open("deposit_addresses.json") as f:
 class AbstractExchange:
     __metaclass__ = ABCMeta
 
+    # Smoothed round-trip time of quote requests and its mean deviation,
+    # estimated the same way TCP estimates its retransmission timeout.
+    srtt = None
+    rttvar = None
+
     @abstractmethod
     def markets(self):
         pass
@@ -45,6 +51,19 @@ class AbstractExchange:
     def get_order(self, uuid):
         pass
 
+    def observe_rtt(self, rtt):
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+
+    def staleness_threshold(self):
+        if self.srtt is None:
+            return None
+        return self.srtt + 4 * self.rttvar
+
     def asks(self, currencies):
         rates = self.tickers(currencies=currencies)
         return {k: v['ask'] for k, v in rates.items()}
@@ -84,14 +103,18 @@ class Bittrex(AbstractExchange):
         rates = {}
 
         for c in currencies:
+            sent = time.time()
             resp = self.client.get_ticker(market='BTC-%s' % c)
+            received = time.time()
             if resp['message'] == 'NO_API_RESPONSE':
                 raise Exception('No response from server')
             elif resp['success'] and not resp['result']:
                 raise Exception('Empty response from server')
             elif not resp['success']:
                 raise ClientError(resp)
+            self.observe_rtt(received - sent)
             rates[c] = {k.lower(): v for k, v in resp['result'].items()}
+            rates[c].update(received=received, rtt=received - sent)
 
         return rates
 
@@ -204,15 +227,21 @@ class Kraken(AbstractExchange):
     def tickers(self, currencies):
         mapping = {'a': 'ask', 'b': 'bid', 'c': 'last'}
         pairs = ','.join(map(lambda x: 'X%sXXBT' % x, currencies))
+        sent = time.time()
         resp = self.client.query_public(method="Ticker", req={'pair': pairs})
+        received = time.time()
         if resp['error']: raise ClientError(resp['error'])
 
-        return {
+        self.observe_rtt(received - sent)
+        rates = {
             k[1:4]:
             {mapping[sk]: float(v[sk][0])
              for sk in v if sk in mapping}
             for k, v in resp['result'].items()
         }
+        for rate in rates.values():
+            rate.update(received=received, rtt=received - sent)
+        return rates
 
     @log_event
     def balances(self, currencies):
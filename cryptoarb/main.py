@@ -1,8 +1,17 @@
+import os
+import argparse
 from multiprocessing import Process
-from trade import arbitrage
+from trade import (arbitrage, calc_pnl_unpack, currencies, exchanges,
+                   minimum_order_size, x_map)
+from coordinator import (Coordinator, Worker, SocketCollector, SocketPublisher,
+                         parse_address, shard)
+from evaluator import StalenessGuard
+from util import initialize_logger
 
+markets = [(ex, c) for ex in exchanges for c in currencies]
 
-def main():
+
+def run_local():
     procs = [
         Process(target=arbitrage, args=(ex, )) for ex in ['Bittrex', 'Kraken']
     ]
@@ -12,5 +21,68 @@ def main():
         p.join()
 
 
+def run_worker(address, authkey, index, count):
+    logger = initialize_logger('WORKER-%d' % index)
+    worker = Worker(
+        assignment=shard(markets, index, count),
+        apis=x_map,
+        score=calc_pnl_unpack,
+        transport=SocketPublisher(parse_address(address), authkey),
+        guard=StalenessGuard(apis=x_map, logger=logger),
+        logger=logger)
+    worker.run()
+
+
+def run_coordinator(address, authkey, workers):
+    logger = initialize_logger('COORDINATOR')
+    # Bind before forking so that local workers can connect right away.
+    collector = SocketCollector(parse_address(address), authkey, logger)
+    procs = [
+        Process(target=run_worker, args=(address, authkey, i, workers))
+        for i in xrange(workers)
+    ]
+    for p in procs:
+        p.daemon = True
+        p.start()
+
+    coordinator = Coordinator(
+        apis=x_map,
+        transport=collector,
+        minimum_order_size=minimum_order_size,
+        logger=logger)
+    coordinator.run()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        'mode',
+        nargs='?',
+        default='local',
+        choices=['local', 'coordinator', 'worker'])
+    parser.add_argument('--address', default='localhost:6000')
+    # Workers and the coordinator exchange pickles, so the shared key is what
+    # keeps strangers from running code on the hosts. There is no default.
+    parser.add_argument(
+        '--authkey', default=os.environ.get('CRYPTOARB_AUTHKEY'))
+    # Number of worker processes the coordinator forks on its own host.
+    parser.add_argument('--workers', type=int, default=0)
+    # Shard of the markets a remote worker scans, out of --shards.
+    parser.add_argument('--shard', type=int, default=0)
+    parser.add_argument('--shards', type=int, default=1)
+    args = parser.parse_args()
+
+    if args.mode in ('coordinator', 'worker') and not args.authkey:
+        parser.error('%s mode requires --authkey or CRYPTOARB_AUTHKEY' %
+                     args.mode)
+
+    if args.mode == 'coordinator':
+        run_coordinator(args.address, args.authkey, args.workers)
+    elif args.mode == 'worker':
+        run_worker(args.address, args.authkey, args.shard, args.shards)
+    else:
+        run_local()
+
+
 if __name__ == '__main__':
     main()
@@ -1,14 +1,14 @@
 import time
-from multiprocessing import Pool
 from collections import namedtuple
-from operator import attrgetter
 
+from evaluator import (OpportunityEvaluator, StalenessGuard,
+                       refresh_opportunities)
 from exchange import Bittrex, Kraken
 from util import initialize_logger
 
 ArbOpp = namedtuple('ArbOpp', [
     'pnl', 'size', 'currency', 'orig_rate', 'dest_rate', 'destination',
-    'spread_pct'
+    'spread_pct', 'orig_received', 'dest_received'
 ])
 exchanges = ['Bittrex', 'Kraken']
 x_map = {'Bittrex': Bittrex(), 'Kraken': Kraken()}
@@ -29,24 +29,32 @@ logger = initialize_logger('MAIN')
 
 
 def arbitrage(origin):
+    assert origin in exchanges, 'Invalid origin.'
+
+    # List of exchanges that we could potentially sell on
+    destinations = exchanges[:]
+    destinations.remove(origin)
+    destination_apis = map(lambda x: x_map[x], destinations)
+    origin_api = x_map[origin]
+
+    evaluator = OpportunityEvaluator(origin=origin, score=calc_pnl_unpack)
+    guard = StalenessGuard(apis=x_map, logger=logger)
+
     while True:
         start = time.time()
-        assert origin in exchanges, 'Invalid origin.'
 
-        # List of exchanges that we could potentially sell on
-        destinations = exchanges[:]
-        destinations.remove(origin)
-        destination_apis = map(lambda x: x_map[x], destinations)
-        origin_api = x_map[origin]
-
-        opps = arb_opportunities(
+        refresh_opportunities(
+            evaluator=evaluator,
             currencies=currencies,
             orig_api=origin_api,
             dest_apis=destination_apis)
-        best_opp = opps[0]
+        best_opp = evaluator.best()
         end = time.time()
 
-        if best_opp.pnl > 0 and best_opp.spread_pct >= 0.01:
+        # No opportunity exists until every input of some candidate is known.
+        profitable = best_opp is not None and best_opp.pnl > 0 \
+            and best_opp.spread_pct >= 0.01
+        if profitable and guard.fresh(origin, best_opp):
             print('Origin: {} - Start time: {} - Time elapsed: {}\n'
                   'Best opportunity: {}\n').format(origin, str(start),
                                                    str(end - start),
@@ -75,7 +83,7 @@ def arbitrage(origin):
                 size=min(best_opp.size, balance),
                 destination=best_opp.destination)
 
-        else:
+        elif not profitable:
             logger.debug(
                 'There exist no profitable spreads from {} at the moment.'.
                 format(origin))
@@ -83,39 +91,16 @@ def arbitrage(origin):
         time.sleep(30)
 
 
-def arb_opportunities(currencies, orig_api, dest_apis):
-    orig_bal = orig_api.balances(currencies=['BTC'])['BTC']
-    dest_bals = {
-        ex.name: ex.balances(currencies=currencies)
-        for ex in dest_apis
-    }
-
-    orig_rates = orig_api.asks(currencies=currencies)
-    dest_rates = {ex.name: ex.bids(currencies=currencies) for ex in dest_apis}
-
-    data = []
-    for exchange, rates in dest_rates.items():
-        for currency, rate in rates.items():
-            data.append({
-                'origin': orig_api.name,
-                'destination': exchange,
-                'currency': currency,
-                'orig_rate': orig_rates[currency],
-                'dest_rate': rate,
-                'orig_bal': orig_bal,
-                'dest_bal': dest_bals[exchange][currency],
-            })
-
-    pool = Pool()
-    result = pool.map(calc_pnl_unpack, data)
-    pool.close()
-    pool.join()
-    return sorted(result, key=attrgetter('pnl'), reverse=True)
-
-
 def calc_pnl_unpack(kwargs):
-    def calc_pnl(origin, destination, currency, orig_rate, dest_rate, orig_bal,
-                 dest_bal):
+    def calc_pnl(origin,
+                 destination,
+                 currency,
+                 orig_rate,
+                 dest_rate,
+                 orig_bal,
+                 dest_bal,
+                 orig_received=None,
+                 dest_received=None):
         # orig_size = min(orig_bal, 0.1) / orig_rate
         orig_size = orig_bal / orig_rate
         dest_size = dest_bal
@@ -145,6 +130,8 @@ def calc_pnl_unpack(kwargs):
             orig_rate=orig_rate,
             dest_rate=dest_rate,
             destination=destination,
-            spread_pct=spread_pct)
+            spread_pct=spread_pct,
+            orig_received=orig_received,
+            dest_received=dest_received)
 
     return calc_pnl(**kwargs)
@@ -0,0 +1,223 @@
+import time
+import unittest
+import logging
+from collections import namedtuple
+from multiprocessing import AuthenticationError
+
+from cryptoarb.coordinator import (Coordinator, LocalTransport, SocketCollector,
+                                   SocketPublisher, Worker, parse_address,
+                                   shard)
+
+Opp = namedtuple('Opp', [
+    'pnl', 'size', 'currency', 'orig_rate', 'dest_rate', 'destination',
+    'spread_pct', 'orig_received', 'dest_received'
+])
+
+
+def score(kwargs):
+    size = int(
+        min(kwargs['orig_bal'] / kwargs['orig_rate'], kwargs['dest_bal']))
+    return Opp(
+        pnl=(kwargs['dest_rate'] - kwargs['orig_rate']) * size,
+        size=size,
+        currency=kwargs['currency'],
+        orig_rate=kwargs['orig_rate'],
+        dest_rate=kwargs['dest_rate'],
+        destination=kwargs['destination'],
+        spread_pct=kwargs['dest_rate'] / kwargs['orig_rate'] - 1,
+        orig_received=kwargs['orig_received'],
+        dest_received=kwargs['dest_received'])
+
+
+class TestAPI(object):
+    def __init__(self, name, balances, asks, bids):
+        self.name = name
+        self._balances = balances
+        self._asks = asks
+        self._bids = bids
+        self.orders = []
+        self.fail = set()
+        self.on_balances = None
+
+    def balances(self, currencies):
+        balances = {c: self._balances.get(c, 0.0) for c in currencies}
+        # Lets a test run something between a balance read and its use.
+        if self.on_balances is not None:
+            callback, self.on_balances = self.on_balances, None
+            callback()
+        return balances
+
+    def tickers(self, currencies):
+        received = time.time()
+        return {
+            c: {
+                'ask': self._asks[c],
+                'bid': self._bids[c],
+                'received': received
+            }
+            for c in currencies
+        }
+
+    def buy(self, currency, size, rate):
+        self.orders.append(('buy', currency, size))
+
+    def sell(self, currency, size, rate):
+        if 'sell' in self.fail:
+            raise Exception('No response from server')
+        self.orders.append(('sell', currency, size))
+
+    def withdraw(self, currency, size, destination):
+        self.orders.append(('withdraw', currency, size))
+
+    def staleness_threshold(self):
+        return None
+
+
+class ShardTests(unittest.TestCase):
+    def test_shards_are_disjoint_and_complete(self):
+        markets = [(ex, c) for ex in ['Bittrex', 'Kraken']
+                   for c in ['XRP', 'XLM', 'ETH']]
+        seen = []
+        for i in range(4):
+            for origin, currencies in shard(markets, i, 4).items():
+                seen.extend((origin, c) for c in currencies)
+        self.assertEqual(sorted(seen), sorted(markets))
+
+    def test_parse_address(self):
+        self.assertEqual(parse_address('localhost:6000'), ('localhost', 6000))
+
+
+class SocketTransportTests(unittest.TestCase):
+    def setUp(self):
+        self.collector = SocketCollector(
+            ('localhost', 0), 'secret', logger=logging.getLogger('test'))
+        self.address = self.collector.listener.address
+
+    def test_bad_authkey_does_not_stop_accepting(self):
+        self.assertRaises(AuthenticationError, SocketPublisher, self.address,
+                          'wrong')
+        publisher = SocketPublisher(self.address, 'secret')
+        publisher.publish('ping')
+        self.assertEqual(self.collector.receive(timeout=5)[0], 'ping')
+
+    def test_publisher_reconnects(self):
+        publisher = SocketPublisher(self.address, 'secret')
+        publisher.conn.close()
+        publisher.publish('ping')
+        self.assertEqual(self.collector.receive(timeout=5)[0], 'ping')
+
+
+class CoordinatorTests(unittest.TestCase):
+    def setUp(self):
+        self.apis = {
+            'Bittrex':
+            TestAPI('Bittrex', {'BTC': 1.0}, {'XRP': 0.0001}, {'XRP': 0.0001}),
+            'Kraken':
+            TestAPI('Kraken', {'XRP': 1000.0}, {'XRP': 0.0002},
+                    {'XRP': 0.0002}),
+        }
+        self.transport = LocalTransport()
+        self.coordinator = Coordinator(
+            apis=self.apis,
+            transport=self.transport,
+            settle_delay=0,
+            logger=logging.getLogger('test'))
+
+    def opp(self, size, received=None):
+        received = time.time() if received is None else received
+        return Opp(
+            pnl=0.1,
+            size=size,
+            currency='XRP',
+            orig_rate=0.0001,
+            dest_rate=0.0002,
+            destination='Kraken',
+            spread_pct=1.0,
+            orig_received=received,
+            dest_received=received)
+
+    def handle(self, opp, age=0.0, arrived=None):
+        arrived = time.time() if arrived is None else arrived
+        return self.coordinator.handle('Bittrex', opp, age, 0.0, 1.0, arrived)
+
+    def test_worker_publishes_to_coordinator(self):
+        worker = Worker(
+            assignment={'Bittrex': ['XRP']},
+            apis=self.apis,
+            score=score,
+            transport=self.transport,
+            logger=logging.getLogger('test'))
+        self.assertEqual(len(worker.scan()), 1)
+        thread = self.coordinator.poll(timeout=1)
+        thread.join()
+        self.assertEqual(self.apis['Bittrex'].orders[0], ('buy', 'XRP', 1000))
+        self.assertEqual(self.apis['Kraken'].orders[0], ('sell', 'XRP', 1000))
+
+    def test_reservations_prevent_double_spending(self):
+        self.assertEqual(self.coordinator.reserve('Bittrex', self.opp(600)),
+                         600)
+        self.assertEqual(self.coordinator.reserve('Bittrex', self.opp(600)),
+                         400)
+        self.assertEqual(self.coordinator.reserve('Bittrex', self.opp(600)), 0)
+
+    def test_release_during_balance_fetch_is_not_double_spent(self):
+        first = self.opp(600)
+        self.assertEqual(self.coordinator.reserve('Bittrex', first), 600)
+
+        def settle():
+            self.apis['Kraken']._balances['XRP'] = 400.0
+            self.coordinator.release('Bittrex', first, 600)
+
+        self.apis['Kraken'].on_balances = settle
+        self.assertEqual(self.coordinator.reserve('Bittrex', self.opp(600)),
+                         400)
+
+    def test_failed_trade_releases_reservation(self):
+        self.apis['Kraken'].fail.add('sell')
+        thread = self.handle(self.opp(600))
+        thread.join()
+        self.assertEqual(self.apis['Bittrex'].orders, [('buy', 'XRP', 600)])
+        self.assertEqual(self.coordinator.reserved[('Kraken', 'XRP')], 0)
+
+    def test_release_after_execution(self):
+        thread = self.handle(self.opp(600))
+        thread.join()
+        self.assertEqual(self.coordinator.reserved[('Kraken', 'XRP')], 0)
+        self.assertEqual(self.coordinator.reserved[('Bittrex', 'BTC')], 0)
+
+    def test_stale_opportunity_is_dropped(self):
+        arrived = time.time() - self.coordinator.max_age - 1
+        self.assertTrue(self.handle(self.opp(600), arrived=arrived) is None)
+
+    def test_queued_quotes_are_rejected_before_buying(self):
+        # Fresh when the worker published it, but it sat in the queue for
+        # longer than the worker's window allows.
+        thread = self.handle(self.opp(600), age=0.5, arrived=time.time() - 2)
+        thread.join()
+        self.assertEqual(self.coordinator.guard.avoided, 1)
+        self.assertEqual(self.apis['Bittrex'].orders, [])
+        self.assertEqual(self.coordinator.reserved[('Kraken', 'XRP')], 0)
+
+    def test_worker_measures_ages_on_its_own_clock(self):
+        worker = Worker(
+            assignment={'Bittrex': ['XRP']},
+            apis=self.apis,
+            score=score,
+            transport=self.transport,
+            logger=logging.getLogger('test'))
+        worker.scan()
+        (origin, opp, age, skew, window), _ = self.transport.receive(timeout=1)
+        self.assertEqual(origin, 'Bittrex')
+        self.assertTrue(0 <= age < window)
+        self.assertTrue(0 <= skew < window)
+
+    def test_worker_skips_unprofitable_spreads(self):
+        self.apis['Kraken']._bids['XRP'] = 0.000100001
+        worker = Worker(
+            assignment={'Bittrex': ['XRP']},
+            apis=self.apis,
+            score=score,
+            transport=self.transport,
+            logger=logging.getLogger('test'))
+        self.assertEqual(worker.scan(), [])
+        self.assertEqual(worker.guard.checked, 0)
@@ -0,0 +1,140 @@
+import unittest
+import logging
+from collections import namedtuple
+
+from cryptoarb.evaluator import OpportunityEvaluator, StalenessGuard
+
+Opp = namedtuple('Opp', [
+    'pnl', 'currency', 'destination', 'orig_received', 'dest_received'
+])
+
+
+class CountingScore(object):
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, kwargs):
+        self.calls.append((kwargs['destination'], kwargs['currency']))
+        pnl = (kwargs['dest_rate'] - kwargs['orig_rate']) * min(
+            kwargs['orig_bal'] / kwargs['orig_rate'], kwargs['dest_bal'])
+        return Opp(
+            pnl=pnl,
+            currency=kwargs['currency'],
+            destination=kwargs['destination'],
+            orig_received=kwargs['orig_received'],
+            dest_received=kwargs['dest_received'])
+
+
+class OpportunityEvaluatorTests(unittest.TestCase):
+    def setUp(self):
+        self.score = CountingScore()
+        self.evaluator = OpportunityEvaluator(
+            origin='Bittrex', score=self.score)
+        self.evaluator.update_orig_balance(1.0)
+        for currency, rate in [('XRP', 0.0001), ('XLM', 0.00002)]:
+            self.evaluator.update_orig_rate(currency, rate)
+            self.evaluator.update_dest_rate('Kraken', currency, rate)
+            self.evaluator.update_dest_balance('Kraken', currency, 1000.0)
+        self.score.calls = []
+
+    def test_best(self):
+        self.evaluator.update_dest_rate('Kraken', 'XLM', 0.00003)
+        best = self.evaluator.best()
+        self.assertEqual(best.currency, 'XLM')
+        self.assertTrue(best.pnl > 0)
+
+    def test_rescores_only_affected_candidate(self):
+        self.evaluator.update_dest_rate('Kraken', 'XRP', 0.0002)
+        self.assertEqual(self.score.calls, [('Kraken', 'XRP')])
+
+    def test_unchanged_update_is_ignored(self):
+        self.evaluator.update_dest_balance('Kraken', 'XRP', 1000.0)
+        self.evaluator.update_orig_rate('XLM', 0.00002)
+        self.assertEqual(self.score.calls, [])
+
+    def test_stale_entries_are_skipped(self):
+        self.evaluator.update_dest_rate('Kraken', 'XRP', 0.0002)
+        self.evaluator.update_dest_rate('Kraken', 'XLM', 0.00003)
+        self.assertEqual(self.evaluator.best().currency, 'XRP')
+        self.evaluator.update_dest_rate('Kraken', 'XRP', 0.00005)
+        self.assertEqual(self.evaluator.best().currency, 'XLM')
+
+    def test_compaction_preserves_best(self):
+        for i in range(100):
+            self.evaluator.update_dest_rate('Kraken', 'XRP', 0.0001 + i * 1e-8)
+        self.assertTrue(len(self.evaluator.heap) <= 2 * 2 + 16)
+        self.assertEqual(self.evaluator.best().currency, 'XRP')
+
+    def test_best_first(self):
+        self.evaluator.update_dest_rate('Kraken', 'XRP', 0.0002)
+        self.evaluator.update_dest_rate('Kraken', 'XLM', 0.00003)
+        self.evaluator.update_dest_rate('Kraken', 'XRP', 0.00005)
+        ranked = [opp.currency for opp in self.evaluator.best_first()]
+        self.assertEqual(ranked, ['XLM', 'XRP'])
+
+    def test_incomplete_candidate_is_not_scored(self):
+        self.evaluator.update_dest_rate('Kraken', 'ETH', 0.05)
+        self.assertEqual(self.score.calls, [])
+        self.assertEqual(len(self.evaluator.opps), 2)
+
+    def test_restamp_without_rescore(self):
+        self.evaluator.update_orig_rate('XRP', 0.0001, received=10.0)
+        self.evaluator.update_dest_rate(
+            'Kraken', 'XRP', 0.0001, received=11.0)
+        self.assertEqual(self.score.calls, [])
+        opp = self.evaluator.opps[('Kraken', 'XRP')]
+        self.assertEqual((opp.orig_received, opp.dest_received), (10.0, 11.0))
+
+
+class LatencyTestAPI(object):
+    def __init__(self, threshold):
+        self.threshold = threshold
+
+    def staleness_threshold(self):
+        return self.threshold
+
+
+class StalenessGuardTests(unittest.TestCase):
+    def setUp(self):
+        self.guard = StalenessGuard(
+            apis={
+                'Bittrex': LatencyTestAPI(1.5),
+                'Kraken': LatencyTestAPI(0.5)
+            },
+            logger=logging.getLogger('test'))
+
+    def opp(self, orig_received, dest_received):
+        return Opp(
+            pnl=1.0,
+            currency='XRP',
+            destination='Kraken',
+            orig_received=orig_received,
+            dest_received=dest_received)
+
+    def test_window(self):
+        self.assertEqual(self.guard.window('Bittrex', 'Kraken'), 2.0)
+        self.guard.apis['Kraken'].threshold = None
+        self.assertEqual(self.guard.window('Bittrex', 'Kraken'), 1.5)
+
+    def test_fresh(self):
+        self.assertTrue(self.guard.fresh('Bittrex', self.opp(100.0, 101.0),
+                                         now=102.0))
+        self.assertEqual(self.guard.avoided, 0)
+
+    def test_skewed_legs_are_rejected(self):
+        self.assertFalse(self.guard.fresh('Bittrex', self.opp(100.0, 103.0),
+                                          now=103.0))
+        self.assertEqual(self.guard.avoided, 1)
+
+    def test_admit_uses_given_measurements(self):
+        self.assertTrue(
+            self.guard.admit('Bittrex', self.opp(0.0, 0.0), 3.0, 1.0, 2.0))
+        self.assertFalse(
+            self.guard.admit('Bittrex', self.opp(0.0, 0.0), 4.5, 1.0, 2.0))
+        self.assertEqual((self.guard.avoided, self.guard.checked), (1, 2))
+
+    def test_old_legs_are_rejected(self):
+        self.assertFalse(self.guard.fresh('Bittrex', self.opp(100.0, 100.0),
+                                          now=105.0))
+        self.assertFalse(self.guard.fresh('Bittrex', self.opp(None, 100.0)))
+        self.assertEqual((self.guard.avoided, self.guard.checked), (2, 2))
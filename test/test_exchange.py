@@ -31,6 +31,9 @@ class BittrexTestClient(BaseTestClient):
     def __init__(self):
         self.name = 'bittrex'
 
+    def get_ticker(self, market):
+        return self.fetch_sample_response('getticker')
+
     def get_balances(self):
         return self.fetch_sample_response('getbalances')
 
@@ -65,6 +68,13 @@ class BittrexTests(unittest.TestCase):
     def setUp(self):
         self.api = BittrexTestAPI()
 
+    def test_tickers(self):
+        rates = self.api.tickers(currencies=['XRP'])
+        required_keys = ['ask', 'bid', 'last', 'received', 'rtt']
+        self.assertTrue(all(k in rates['XRP'] for k in required_keys))
+        self.assertTrue(rates['XRP']['rtt'] >= 0)
+        self.assertTrue(self.api.staleness_threshold() is not None)
+
     def test_balances(self):
         balances = self.api.balances(currencies=['BTC', 'XRP'])
         self.assertTrue(set(balances.keys()) == set(['BTC', 'XRP']))
@@ -100,6 +110,13 @@ class KrakenTests(unittest.TestCase):
     def setUp(self):
         self.api = KrakenTestAPI()
 
+    def test_tickers(self):
+        rates = self.api.tickers(currencies=['XRP'])
+        required_keys = ['ask', 'bid', 'last', 'received', 'rtt']
+        self.assertTrue(all(k in rates['XRP'] for k in required_keys))
+        self.assertTrue(rates['XRP']['rtt'] >= 0)
+        self.assertTrue(self.api.staleness_threshold() is not None)
+
     def test_balances(self):
         balances = self.api.balances(currencies=['BTC', 'XRP'])
         self.assertTrue(set(balances.keys()) == set(['BTC', 'XRP']))